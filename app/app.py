@@ -1,17 +1,31 @@
+import bisect
+import html
 import os
 import sys
 
 sys.path.append(os.path.dirname(__file__))
 
+import numpy as np
 import streamlit as st
-from facets import collect_facet_options
-from similarity import semantic_search, load_songs
+from facets import join_tags
+from similarity import (
+    cached_semantic_search,
+    count_in_scope,
+    get_facet_options,
+    warmup,
+)
 
 st.set_page_config(page_title="Semantic Music Search", layout="wide")
-songs = load_songs()
-faceted_options = collect_facet_options(songs)
+
+# Songs and facet options come from similarity's caches (keyed on the
+# songs.json / vectors mtimes), so filters and search always see the same data.
+faceted_options = get_facet_options()
 
 # ---- Color code scores (match strength) ----
+_STRENGTH_THRESHOLDS = (0.20, 0.30, 0.45)
+_STRENGTH_COLORS = ("#ba3c3c", "#c57834", "#cca43f", "#2fb751")
+
+
 def match_strength(score: float | None):
     """
     Returns (label, value, color) based on:
@@ -23,14 +37,97 @@ def match_strength(score: float | None):
     """
     if score is None:
         return ("Match Strength:", "N/A", "#9ca3af")
-    if score >= 0.45:
-        return ("Match Strength:", f"{score:.3f}", "#2fb751")
-    elif score >= 0.30:
-        return ("Match Strength:", f"{score:.3f}", "#cca43f")
-    elif score >= 0.20:
-        return ("Match Strength:", f"{score:.3f}", "#c57834")
+    color = _STRENGTH_COLORS[bisect.bisect_right(_STRENGTH_THRESHOLDS, score)]
+    return ("Match Strength:", f"{score:.3f}", color)
+
+
+def match_strengths(scores: list) -> list:
+    """match_strength for a whole result list, bucketing every score in one np.digitize."""
+    arr = np.array([np.nan if sc is None else sc for sc in scores], dtype=np.float64)
+    colors = np.array(_STRENGTH_COLORS)[np.digitize(arr, _STRENGTH_THRESHOLDS)].tolist()
+    return [
+        match_strength(None) if sc is None else ("Match Strength:", f"{sc:.3f}", color)
+        for sc, color in zip(scores, colors)
+    ]
+
+
+# ---- Result rendering (one HTML block per result, one st.markdown per list) ----
+# Labels for the tag breakdown, keyed by the fields in r["_tag_strings"]
+_TAG_LABELS = {
+    "mood": "Mood",
+    "activity": "Activity",
+    "genre": "Genre",
+    "energy": "Energy",
+    "vibe_tags": "Vibe tags",
+}
+
+
+def _tags_html(r: dict) -> str:
+    # r["_tag_strings"] is joined once per song in similarity._get_result_rows
+    rows = []
+    for field, text in r.get("_tag_strings", ()):
+        if field == "vibe_tags" and (not text or text == "None"):
+            continue
+        rows.append(f"<p><b>{_TAG_LABELS[field]}:</b> {html.escape(text)}</p>")
+    return "".join(rows)
+
+
+def render_result_html(i: int, r: dict, strength: tuple | None = None) -> str:
+    """
+    Title (+ score badge, if `strength` from match_strength is given),
+    description and the tag breakdown for one result.
+    Uses native <details> instead of st.expander so a whole page of results
+    renders as a single Streamlit element.
+    """
+    esc = html.escape
+    title = esc(str(r.get("title", "Untitled")))
+    artist = esc(join_tags(r.get("artist", "Unknown")))
+    desc = (r.get("description") or "").strip()
+
+    score_html = ""
+    if strength is not None:
+        label, value, color = strength
+        score_html = (
+            '<div style="font-size: 0.95rem; font-weight: 400; white-space: nowrap;">'
+            f'<span style="color: #9ca3af;">{label}</span>'
+            f'<span style="color: {color}; margin-left: 0.25rem;">{value}</span>'
+            "</div>"
+        )
+
+    if desc:
+        # A blank line would end Markdown's HTML block and turn the rest into a code block
+        desc_html = "<p>" + "<br>".join(esc(line) for line in desc.splitlines() if line.strip()) + "</p>"
     else:
-        return ("Match Strength:", f"{score:.3f}", "#ba3c3c")
+        desc_html = '<p style="color: #9ca3af; font-size: 0.875rem;">No description provided.</p>'
+
+    tags_html = _tags_html(r)
+
+    # No leading indentation: 4+ spaces would be read as a Markdown code block
+    return "\n".join([
+        '<div style="display: flex; justify-content: space-between; align-items: baseline; gap: 1rem;">',
+        f'<div style="font-size: 1.35rem; font-weight: 700; line-height: 1.2;">{i}. {title} — {artist}</div>{score_html}',
+        "</div>",
+        desc_html,
+        "<details>",
+        "<summary>If you're wondering why this song is here... this is how I how I tagged it.</summary>",
+        tags_html,
+        "</details>",
+        "<hr>",
+    ])
+
+
+def render_results(results: list, show_score: bool) -> None:
+    if show_score:
+        strengths = match_strengths([r.get("score") for r in results])
+    else:
+        strengths = [None] * len(results)
+    st.markdown(
+        "\n".join(
+            render_result_html(i, r, strength)
+            for i, (r, strength) in enumerate(zip(results, strengths), start=1)
+        ),
+        unsafe_allow_html=True,
+    )
 
 
 # Two-column layout
@@ -93,142 +190,34 @@ with main_col:
 
     # Count songs in scope (facets only)
     if has_any_filter:
-        scoped = semantic_search(query=None, top_k=100_000, filters=filters)
-        st.caption(f"Songs in scope: {len(scoped)}")
+        st.caption(f"Songs in scope: {count_in_scope(filters)}")
 
     # Mode A: semantic search (query exists)
     if has_query:
-        results = semantic_search(query=query, top_k=5, filters=filters)
+        results = cached_semantic_search(query=query, top_k=5, filters=filters)
 
         st.subheader("Top Matches")
 
         if not results:
             st.info("No songs matched those filters / query. Try loosening filters or changing wording.")
         else:
-            for i, r in enumerate(results, start=1):
-                title = r.get("title", "Untitled")
-                artist = r.get("artist", "Unknown")
-                desc = (r.get("description") or "").strip()
-                score = r.get("score")
-
-                col_left, col_right = st.columns([4, 1])
-
-                with col_left:
-                    st.markdown(
-                        f"""
-                        <div style="font-size: 1.35rem; font-weight: 700; line-height: 1.2;">
-                            {i}. {title} — {artist}
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )
-
-                with col_right:
-                    label, value, color = match_strength(score)
-                    st.markdown(
-                        f"""
-                        <div style="
-                            text-align: right;
-                            font-size: 0.95rem;
-                            font-weight: 400;
-                            white-space: nowrap;
-                        ">
-                            <span style="color: #9ca3af;">{label}</span>
-                            <span style="color: {color}; margin-left: 0.25rem;">
-                                {value}
-                            </span>
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )
-
-                if desc:
-                    st.write(desc)
-                else:
-                    st.caption("No description provided.")
-
-                with st.expander(
-                    "If you're wondering why this song is here... this is how I how I tagged it.",
-                    expanded=False,
-                ):
-                    mood_val = r.get("mood", [])
-                    mood_str = ", ".join(mood_val) if isinstance(mood_val, list) else str(mood_val)
-
-                    activity_val = r.get("activity", [])
-                    activity_str = ", ".join(activity_val) if isinstance(activity_val, list) else str(activity_val)
-
-                    genre_val = r.get("genre", [])
-                    genre_str = ", ".join(genre_val) if isinstance(genre_val, list) else str(genre_val)
-
-                    energy_str = str(r.get("energy", ""))
-
-                    vibes = r.get("vibe_tags", [])
-                    vibe_str = ", ".join(vibes) if isinstance(vibes, list) else str(vibes)
-
-                    st.write(f"**Mood:** {mood_str}")
-                    st.write(f"**Activity:** {activity_str}")
-                    st.write(f"**Genre:** {genre_str}")
-                    st.write(f"**Energy:** {energy_str}")
-                    if vibe_str and vibe_str != "None":
-                        st.write(f"**Vibe tags:** {vibe_str}")
-
-                st.divider()
+            render_results(results, show_score=True)
 
     # Mode B: faceted-only browse (no query, filters exist)
     elif has_any_filter:
         st.subheader("Tag-Only Results")
 
         browse_k = st.slider("How many results to show", min_value=5, max_value=50, value=15, step=5)
-        results = semantic_search(query=None, top_k=browse_k, filters=filters)
+        results = cached_semantic_search(query=None, top_k=browse_k, filters=filters)
 
         if not results:
             st.info("No songs matched those filters. Try loosening filters.")
         else:
-            for i, r in enumerate(results, start=1):
-                title = r.get("title", "Untitled")
-                artist = r.get("artist", "Unknown")
-                desc = (r.get("description") or "").strip()
-
-                st.markdown(
-                    f"""
-                    <div style="font-size: 1.35rem; font-weight: 700; line-height: 1.2;">
-                        {i}. {title} — {artist}
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
-                )
-
-                if desc:
-                    st.write(desc)
-                else:
-                    st.caption("No description provided.")
-
-                with st.expander(
-                    "If you're wondering why this song is here... this is how I how I tagged it.",
-                    expanded=False,
-                ):
-                    mood_val = r.get("mood", [])
-                    mood_str = ", ".join(mood_val) if isinstance(mood_val, list) else str(mood_val)
-
-                    activity_val = r.get("activity", [])
-                    activity_str = ", ".join(activity_val) if isinstance(activity_val, list) else str(activity_val)
-
-                    genre_val = r.get("genre", [])
-                    genre_str = ", ".join(genre_val) if isinstance(genre_val, list) else str(genre_val)
-
-                    energy_str = str(r.get("energy", ""))
-
-                    vibes = r.get("vibe_tags", [])
-                    vibe_str = ", ".join(vibes) if isinstance(vibes, list) else str(vibes)
-
-                    st.write(f"**Mood:** {mood_str}")
-                    st.write(f"**Activity:** {activity_str}")
-                    st.write(f"**Genre:** {genre_str}")
-                    st.write(f"**Energy:** {energy_str}")
-                    if vibe_str and vibe_str != "None":
-                        st.write(f"**Vibe tags:** {vibe_str}")
-
-                st.divider()
+            render_results(results, show_score=False)
 
     else:
         st.caption("Start by typing a search or selecting filters.")
+
+# Load the model etc. after the page has rendered, so the first search is fast
+# without delaying the first paint (no-op after the first run).
+warmup()
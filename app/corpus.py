@@ -0,0 +1,48 @@
+# app/corpus.py
+"""
+On-disk corpus layout shared by embeddings.py (writes it) and similarity.py
+(reads it). Kept free of Streamlit so the build script stays a plain script.
+"""
+import hashlib
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+# ----- Paths (relative to repo root) -----
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = REPO_ROOT / "data"
+
+SONGS_PATH = DATA_DIR / "songs.json"
+VECTORS_PATH = DATA_DIR / "song_vectors.npy"
+INT8_VECTORS_PATH = DATA_DIR / "song_vectors_int8.npy"
+INT8_SCALES_PATH = DATA_DIR / "song_vector_scales.npy"
+HNSW_INDEX_PATH = DATA_DIR / "songs.hnsw"
+FACET_OPTIONS_PATH = DATA_DIR / "facet_options.json"
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Use the HNSW index (if hnswlib is installed and embeddings.py built one) only
+# once the library is big enough for brute force to matter; below this the
+# exact matmul is both faster and exact.
+HNSW_MIN_SONGS = 5000
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 100
+
+
+def songs_sha1(raw: bytes) -> str:
+    """Fingerprint of the songs.json bytes that derived files were built from."""
+    return hashlib.sha1(raw).hexdigest()
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantization.
+    Returns (int8 vectors, float32 scales) with vectors ~= q * scales[:, None].
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.max(np.abs(vectors), axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.round(vectors / scales[:, None]).astype(np.int8)
+    return q, scales.astype(np.float32)
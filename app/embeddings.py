@@ -1,29 +1,60 @@
+import hashlib
 import json
-from pathlib import Path
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+try:
+    import hnswlib  # optional: only needed for the approximate top-k index
+except ImportError:
+    hnswlib = None
+
+from corpus import (
+    DATA_DIR,
+    FACET_OPTIONS_PATH,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_INDEX_PATH,
+    HNSW_M,
+    HNSW_MIN_SONGS,
+    INT8_SCALES_PATH,
+    INT8_VECTORS_PATH,
+    MODEL_NAME,
+    SONGS_PATH,
+    VECTORS_PATH,
+    quantize_int8,
+    songs_sha1,
+)
+from facets import collect_facet_options
+
+
+# Output files only the build uses (the shared ones live in corpus.py)
+TEXTS_PATH = DATA_DIR / "song_texts.json"
+HASHES_PATH = DATA_DIR / "song_hashes.json"  # one hash per row of song_vectors.npy
 
-# ----- Paths (relative to repo root) -----
-REPO_ROOT = Path(__file__).resolve().parents[1]
-DATA_DIR = REPO_ROOT / "data"
-SONGS_PATH = DATA_DIR / "songs.json"
+ENCODE_BATCH_SIZE = 64
 
-# Output files we will generate
-VECTORS_PATH = DATA_DIR / "song_vectors.npy"
-TEXTS_PATH = DATA_DIR / "song_texts.json"
+
+# (song key, prefix) pairs, in the order they appear in the embedded tag string.
+# energy is left out on purpose: it's only used for filtering, not ranking.
+TEXT_FIELDS = (
+    ("title", "title"),
+    ("artist", "artist"),
+    ("mood", "mood"),
+    ("activity", "activity"),
+    ("genre", "genre"),
+    ("vibe_tags", "vibe"),
+)
 
 
 def _as_list(value):
     """Normalize strings/lists into a list of strings."""
     if value is None:
         return []
-    if isinstance(value, list):
-        return [str(v).strip() for v in value if str(v).strip()]
     if isinstance(value, str):
         v = value.strip()
         return [v] if v else []
+    if isinstance(value, list):
+        return [t for t in (str(v).strip() for v in value) if t]
     return [str(value).strip()]
 
 
@@ -33,35 +64,46 @@ def build_song_text(song: dict) -> str:
     We include facets + vibe tags + description so semantic search can benefit
     from your metadata design.
     """
-    title = str(song.get("title", "")).strip()
-    artists = _as_list(song.get("artist"))
-
-    moods = _as_list(song.get("mood"))
-    activities = _as_list(song.get("activity"))
-    energy = str(song.get("energy", "")).strip()
-    genres = _as_list(song.get("genre"))
-    vibe_tags = _as_list(song.get("vibe_tags"))
+    # Combine structured tags into a compact "tag string" in one pass
+    tags = []
+    for key, prefix in TEXT_FIELDS:
+        values = _as_list(song.get(key))
+        if values:
+            tags.append(f"{prefix}: {', '.join(values)}")
 
+    # Final text: tags + description
+    tag_str = " | ".join(tags)
     description = str(song.get("description", "")).strip()
+    if tag_str and description:
+        return f"{tag_str}\n{description}"
+    return tag_str or description
 
-    # Combine structured tags into a compact "tag string"
-    tags = []
-    tags += [f"title: {title}"] if title else []
-    tags += [f"artist: {', '.join(artists)}"] if artists else []
-    tags += [f"mood: {', '.join(moods)}"] if moods else []
-    tags += [f"activity: {', '.join(activities)}"] if activities else []
-  #  tags += [f"energy: {energy}"] if energy else [] - decided to not use energy for ranking, only for filtering
-    tags += [f"genre: {', '.join(genres)}"] if genres else []
-    tags += [f"vibe: {', '.join(vibe_tags)}"] if vibe_tags else []
 
-    # Final text: tags + description
-    parts = []
-    if tags:
-        parts.append(" | ".join(tags))
-    if description:
-        parts.append(description)
+def text_hash(text: str) -> str:
+    """Hash of the embedded text (and model), used to skip re-encoding unchanged songs."""
+    return hashlib.sha1(f"{MODEL_NAME}\n{text}".encode("utf-8")).hexdigest()
+
+
+def load_previous_vectors() -> dict:
+    """
+    Map text hash -> vector from the last run (empty if there is nothing
+    usable on disk, e.g. first run or the files are out of sync).
+    """
+    if not VECTORS_PATH.exists() or not HASHES_PATH.exists():
+        return {}
+    vectors = np.load(VECTORS_PATH)
+    hashes = json.loads(HASHES_PATH.read_text(encoding="utf-8"))
+    if vectors.ndim != 2 or len(hashes) != vectors.shape[0]:
+        return {}
+    return {h: vectors[i] for i, h in enumerate(hashes)}
+
 
-    return "\n".join(parts).strip()
+def build_hnsw_index(vectors: np.ndarray) -> None:
+    """Build and save an HNSW (cosine) index whose labels are row numbers in song_vectors.npy."""
+    index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+    index.init_index(max_elements=len(vectors), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+    index.add_items(vectors, np.arange(len(vectors)))
+    index.save_index(str(HNSW_INDEX_PATH))
 
 
 def main():
@@ -69,28 +111,64 @@ def main():
         raise FileNotFoundError(f"Could not find {SONGS_PATH}")
 
     # Load dataset
-    songs = json.loads(SONGS_PATH.read_text(encoding="utf-8"))
+    raw = SONGS_PATH.read_bytes()
+    songs = json.loads(raw)
     if not isinstance(songs, list) or len(songs) == 0:
         raise ValueError("songs.json must be a non-empty list of song objects.")
 
     # Build texts to embed
     song_texts = [build_song_text(song) for song in songs]
-
-    # Load embedding model (small + fast + good enough for this project)
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    # Compute embeddings
-    vectors = model.encode(song_texts, show_progress_bar=True, normalize_embeddings=True)
+    hashes = [text_hash(t) for t in song_texts]
+
+    # Reuse vectors for songs whose text didn't change; only encode the rest
+    previous = load_previous_vectors()
+    changed = sorted({i for i, h in enumerate(hashes) if h not in previous})
+
+    if changed:
+        # Load embedding model (small + fast + good enough for this project)
+        model = SentenceTransformer(MODEL_NAME)
+        new_vectors = model.encode(
+            [song_texts[i] for i in changed],
+            batch_size=ENCODE_BATCH_SIZE,
+            convert_to_numpy=True,
+            show_progress_bar=True,
+            normalize_embeddings=True,
+        )
+        for i, v in zip(changed, new_vectors):
+            previous[hashes[i]] = v
+
+    # Store as C-contiguous float32: similarity.py memory-maps the file and can
+    # then feed it to BLAS as-is (any other layout forces a full in-RAM copy)
+    vectors = np.ascontiguousarray(np.stack([previous[h] for h in hashes]), dtype=np.float32)
 
     # Save outputs
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     np.save(VECTORS_PATH, vectors)
+    q_vectors, scales = quantize_int8(vectors)
+    np.save(INT8_VECTORS_PATH, q_vectors)
+    np.save(INT8_SCALES_PATH, scales)
     TEXTS_PATH.write_text(json.dumps(song_texts, indent=2, ensure_ascii=False), encoding="utf-8")
+    HASHES_PATH.write_text(json.dumps(hashes, indent=2), encoding="utf-8")
+    # Filter options for the app, so it doesn't have to scan songs.json;
+    # songs_sha1 tells it whether they still match the current file
+    facet_options = {"songs_sha1": songs_sha1(raw), "options": collect_facet_options(songs)}
+    FACET_OPTIONS_PATH.write_text(
+        json.dumps(facet_options, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+    # similarity.py only reads the index for libraries of HNSW_MIN_SONGS+
+    if hnswlib is not None and len(vectors) >= HNSW_MIN_SONGS:
+        build_hnsw_index(vectors)
+        print(f"Saved HNSW index to: {HNSW_INDEX_PATH}")
+    elif HNSW_INDEX_PATH.exists():
+        # Don't leave an index behind that no longer matches the vectors
+        HNSW_INDEX_PATH.unlink()
 
     print(f"Saved vectors to: {VECTORS_PATH}")
+    print(f"Saved int8 vectors to: {INT8_VECTORS_PATH}")
     print(f"Saved embedded texts to: {TEXTS_PATH}")
-    print(f"Songs: {len(songs)} | Vector shape: {vectors.shape}")
+    print(f"Saved facet options to: {FACET_OPTIONS_PATH}")
+    print(f"Songs: {len(songs)} | Re-encoded: {len(changed)} | Vector shape: {vectors.shape}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,6 +1,9 @@
 # app/facets.py
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
 
 def _as_list(value):
     if value is None:
@@ -12,6 +15,10 @@ def _as_list(value):
         return [v] if v else []
     return [str(value).strip()]
 
+def join_tags(value: Any) -> str:
+    """A tag field as display text: lists comma-joined, anything else str()."""
+    return ", ".join(value) if isinstance(value, list) else str(value)
+
 def collect_facet_options(songs: List[Dict[str, Any]]) -> Dict[str, List[str]]:
     """Scan songs.json and return sorted unique options for each facet."""
     moods, activities, energies, genres = set(), set(), set(), set()
@@ -34,12 +41,59 @@ def collect_facet_options(songs: List[Dict[str, Any]]) -> Dict[str, List[str]]:
         "genre": sorted(genres),
     }
 
-def _matches_any(song_values: List[str], selected: List[str]) -> bool:
-    """True if song has at least one of the selected values (OR)."""
-    if not selected:
-        return True
-    sv = set(song_values)
-    return any(x in sv for x in selected)
+FACETS = ("mood", "activity", "genre", "energy")
+
+FacetIndex = Dict[str, Dict[str, np.ndarray]]
+
+def build_facet_index(songs: List[Dict[str, Any]]) -> FacetIndex:
+    """
+    Precompute one packed bitmap (np.packbits, ceil(N/8) bytes) per (facet, value):
+    bit i of index["mood"]["calm"] is set if song i is tagged calm.
+    """
+    n = len(songs)
+    masks: Dict[str, Dict[str, np.ndarray]] = {f: {} for f in FACETS}
+    for i, s in enumerate(songs):
+        for facet in FACETS:
+            for v in _as_list(s.get(facet)):
+                v = sys.intern(v)  # keys compare by identity against interned selections
+                if v not in masks[facet]:
+                    masks[facet][v] = np.zeros(n, dtype=bool)
+                masks[facet][v][i] = True
+    return {f: {v: np.packbits(m) for v, m in values.items()} for f, values in masks.items()}
+
+def _selected_set(selected: Optional[Iterable[str]]) -> frozenset:
+    """Stripped, interned, de-duplicated selected values."""
+    return frozenset(sys.intern(v.strip()) for v in (selected or []) if v.strip())
+
+def _any_bits(values: Dict[str, np.ndarray], selected: Iterable[str], n_bytes: int) -> np.ndarray:
+    """OR of the bitmaps for the selected values (unknown values match nothing)."""
+    bits = np.zeros(n_bytes, dtype=np.uint8)
+    for v in selected:
+        b = values.get(v)
+        if b is not None:
+            bits |= b
+    return bits
+
+def facet_mask(
+    index: FacetIndex,
+    n: int,
+    mood: Optional[List[str]] = None,
+    activity: Optional[List[str]] = None,
+    energy: Optional[str] = None,
+    genre: Optional[List[str]] = None,
+) -> np.ndarray:
+    """Boolean mask of songs passing the filters. OR within a facet, AND across facets.
+    The OR/AND work happens on the packed bitmaps; only the result is unpacked."""
+    n_bytes = (n + 7) // 8
+    bits = np.full(n_bytes, 0xFF, dtype=np.uint8)
+    for facet, selected in (("mood", mood), ("activity", activity), ("genre", genre)):
+        selected = _selected_set(selected)
+        if selected:
+            bits &= _any_bits(index[facet], selected, n_bytes)
+    energy = _selected_set([energy or ""])
+    if energy:
+        bits &= _any_bits(index["energy"], energy, n_bytes)
+    return np.unpackbits(bits, count=n).astype(bool)
 
 def filter_songs(
     songs: List[Dict[str, Any]],
@@ -47,29 +101,10 @@ def filter_songs(
     activity: Optional[List[str]] = None,
     energy: Optional[str] = None,
     genre: Optional[List[str]] = None,
+    index: Optional[FacetIndex] = None,
 ) -> List[Dict[str, Any]]:
-    """Filter songs by selected facets. mood/activity/genre use OR within facet."""
-    mood = mood or []
-    activity = activity or []
-    genre = genre or []
-    energy = (energy or "").strip()
-
-    filtered = []
-    for s in songs:
-        s_mood = _as_list(s.get("mood"))
-        s_activity = _as_list(s.get("activity"))
-        s_genre = _as_list(s.get("genre"))
-        s_energy = str(s.get("energy", "")).strip()
-
-        if not _matches_any(s_mood, mood):
-            continue
-        if not _matches_any(s_activity, activity):
-            continue
-        if not _matches_any(s_genre, genre):
-            continue
-        if energy and s_energy != energy:
-            continue
-
-        filtered.append(s)
-
-    return filtered
\ No newline at end of file
+    """Filter songs by selected facets. mood/activity/genre use OR within facet.
+    Pass a prebuilt `index` (build_facet_index) to skip rebuilding it."""
+    index = index or build_facet_index(songs)
+    mask = facet_mask(index, len(songs), mood=mood, activity=activity, energy=energy, genre=genre)
+    return [songs[i] for i in np.flatnonzero(mask)]
@@ -1,25 +1,91 @@
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Iterable, Tuple
 
 import numpy as np
+import streamlit as st
 from sentence_transformers import SentenceTransformer
 
-
-# ----- Paths (relative to repo root) -----
-REPO_ROOT = Path(__file__).resolve().parents[1]
-DATA_DIR = REPO_ROOT / "data"
-
-SONGS_PATH = DATA_DIR / "songs.json"
-VECTORS_PATH = DATA_DIR / "song_vectors.npy"
-
-MODEL_NAME = "all-MiniLM-L6-v2"
-
-
-def load_songs() -> List[Dict[str, Any]]:
-    if not SONGS_PATH.exists():
-        raise FileNotFoundError(f"Could not find {SONGS_PATH}")
-    songs = json.loads(SONGS_PATH.read_text(encoding="utf-8"))
+try:
+    import hnswlib  # optional: approximate top-k for large libraries
+except ImportError:
+    hnswlib = None
+
+try:
+    import orjson  # optional: faster songs.json parsing
+except ImportError:
+    orjson = None
+
+try:
+    import simsimd  # optional: native SIMD kernels for int8/float dot products
+except ImportError:
+    simsimd = None
+
+from corpus import (
+    FACET_OPTIONS_PATH,
+    HNSW_EF_SEARCH,
+    HNSW_INDEX_PATH,
+    HNSW_MIN_SONGS,
+    INT8_SCALES_PATH,
+    INT8_VECTORS_PATH,
+    MODEL_NAME,
+    SONGS_PATH,
+    VECTORS_PATH,
+    quantize_int8,
+    songs_sha1,
+)
+from facets import FacetIndex, build_facet_index, collect_facet_options, facet_mask, join_tags
+
+logger = logging.getLogger(__name__)
+
+
+# Song fields returned in search results (everything app.py renders)
+RETURN_FIELDS = ("title", "artist", "mood", "activity", "energy", "genre", "vibe_tags", "description")
+# Every result also carries "_tag_strings": ((field, joined text), ...) for
+# these fields in this order, joined once per song for the result cards.
+TAG_FIELDS = ("mood", "activity", "genre", "energy", "vibe_tags")
+
+# Backend for embedding queries: "torch" (default) or "onnx". "onnx" needs
+# sentence-transformers >= 3.2 with onnxruntime installed and runs the ONNX
+# export that ships with the model; ONNX_FILE_NAME picks the (int8 dynamically
+# quantized) variant. Quantized query vectors differ slightly from the torch
+# ones song_vectors.npy was built with, so scores shift a little.
+EMBED_BACKEND = "torch"
+ONNX_FILE_NAME = "onnx/model_qint8_avx512.onnx"
+
+# Score against the int8 copy of the vectors instead of float32.
+# 4x less memory, but scores are approximate (max abs error ~0.003 on this
+# corpus, top-5 order identical for ~91% of test queries; the rest are
+# near-ties swapping). With simsimd installed the int8 kernel is ~3x faster
+# than float32 BLAS (50k x 384); without it NumPy has no int8 GEMV and the
+# fallback is slower than float32.
+USE_INT8_VECTORS = False
+
+# Below this fraction of the library surviving the filters, gather the
+# filtered vectors before scoring; above it, score everything and index.
+GATHER_BELOW_FRACTION = 0.1
+
+# Split float32 scoring of big libraries across a thread pool of this many
+# row shards (NumPy/simsimd release the GIL). 1 = off. When enabling it, run
+# BLAS single-threaded (OMP_NUM_THREADS=1) to avoid oversubscription.
+SCORE_SHARDS = 1
+SHARD_MIN_ROWS = 20000
+
+
+def _read_songs_bytes() -> bytes:
+    try:
+        return SONGS_PATH.read_bytes()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Could not find {SONGS_PATH}") from None
+
+
+def load_songs(raw: Optional[bytes] = None) -> List[Dict[str, Any]]:
+    if raw is None:
+        raw = _read_songs_bytes()
+    # Both parsers take the UTF-8 bytes directly (no decode to str first)
+    songs = orjson.loads(raw) if orjson is not None else json.loads(raw)
     if not isinstance(songs, list) or len(songs) == 0:
         raise ValueError("songs.json must be a non-empty list of song objects.")
     return songs
@@ -30,109 +96,273 @@ def load_vectors() -> np.ndarray:
         raise FileNotFoundError(
             f"Could not find {VECTORS_PATH}. Run: python app/embeddings.py"
         )
-    vectors = np.load(VECTORS_PATH)
+    # Memory-mapped (read-only): the OS pages vectors in on demand and shares
+    # them between processes instead of reading the whole file up front.
+    vectors = np.load(VECTORS_PATH, mmap_mode="r")
     if vectors.ndim != 2:
         raise ValueError(f"Expected a 2D array of vectors, got shape: {vectors.shape}")
-    return vectors
+    # float32 + C-contiguous so the matmul hits BLAS's single-precision fast path
+    # (embeddings.py writes it that way; only older files need the copy)
+    if vectors.dtype != np.float32 or not vectors.flags["C_CONTIGUOUS"]:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    # .npy headers are padded to 64 bytes, so a memmap is already aligned for
+    # AVX-512 loads; copy only if that ever isn't the case
+    return _aligned(vectors)
 
 
-def _ensure_top_k(top_k: int, n_items: int) -> int:
-    if top_k <= 0:
-        return 5
-    return min(top_k, n_items)
+def _aligned(arr: np.ndarray, alignment: int = 64) -> np.ndarray:
+    """arr itself if its data is `alignment`-byte aligned, else an aligned C-contiguous copy."""
+    if arr.ctypes.data % alignment == 0:
+        return arr
+    buf = np.empty(arr.nbytes + alignment, dtype=np.uint8)
+    offset = -buf.ctypes.data % alignment
+    out = buf[offset:offset + arr.nbytes].view(arr.dtype).reshape(arr.shape)
+    out[...] = arr
+    return out
+
+
+def _as_query_vec(vec: np.ndarray) -> np.ndarray:
+    """Query vectors go to the kernels as C-contiguous float32, like song_vectors."""
+    return np.ascontiguousarray(vec, dtype=np.float32)
+
+
+def load_int8_vectors() -> Tuple[np.ndarray, np.ndarray]:
+    if not INT8_VECTORS_PATH.exists() or not INT8_SCALES_PATH.exists():
+        raise FileNotFoundError(
+            f"Could not find {INT8_VECTORS_PATH} / {INT8_SCALES_PATH}. Run: python app/embeddings.py"
+        )
+    q = np.load(INT8_VECTORS_PATH, mmap_mode="r")
+    scales = np.load(INT8_SCALES_PATH)
+    if q.ndim != 2 or q.dtype != np.int8 or scales.shape != (q.shape[0],):
+        raise ValueError(f"Unexpected int8 vectors/scales: {q.dtype} {q.shape}, {scales.shape}")
+    return q, scales
+
+
+def _dot_scores(vectors: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    """Dot product of every row with the query (= cosine, both are normalized)."""
+    if simsimd is not None:
+        return np.asarray(simsimd.cdist(query_vec[None, :], vectors, metric="dot"), dtype=np.float32)[0]
+    return vectors @ query_vec
+
 
+@st.cache_resource(show_spinner=False)
+def _get_score_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=SCORE_SHARDS, thread_name_prefix="score")
 
-def _as_list(x: Any) -> List[str]:
+
+def _sharded_dot_scores(vectors: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    """_dot_scores over contiguous row shards in parallel (see SCORE_SHARDS)."""
+    if SCORE_SHARDS <= 1 or len(vectors) < SHARD_MIN_ROWS:
+        return _dot_scores(vectors, query_vec)
+    bounds = np.linspace(0, len(vectors), SCORE_SHARDS + 1, dtype=np.int64).tolist()
+    parts = _get_score_pool().map(
+        lambda ab: _dot_scores(vectors[ab[0]:ab[1]], query_vec), zip(bounds[:-1], bounds[1:])
+    )
+    return np.concatenate(list(parts))
+
+
+def _int8_scores(q_vecs: np.ndarray, scales: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    """Approximate dot products of int8 song vectors with a float query vector."""
+    q_query, q_scale = quantize_int8(query_vec)
+    if simsimd is not None:
+        # int8 x int8 dot products with int32 accumulation, straight from the int8 buffer
+        raw = np.asarray(simsimd.cdist(q_query, q_vecs, metric="dot"), dtype=np.float32)[0]
+    else:
+        # einsum casts the int8 rows in buffered chunks (no full float copy)
+        raw = np.einsum("ij,j->i", q_vecs, q_query[0].astype(np.float32), dtype=np.float32)
+    return raw * (scales * q_scale[0])
+
+
+@st.cache_resource(show_spinner=False)
+def _get_model(model_name: str = MODEL_NAME, backend: str = EMBED_BACKEND) -> SentenceTransformer:
+    """Load the embedding model once per process (shared across reruns/sessions)."""
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": ONNX_FILE_NAME})
+    return SentenceTransformer(model_name)
+
+
+def _mtime(path: Path) -> float:
+    return path.stat().st_mtime if path.exists() else 0.0
+
+
+def corpus_version() -> Tuple[float, float]:
     """
-    Normalize a field to a list of strings.
-    - list -> list[str]
-    - str  -> [str]
-    - None -> []
+    (songs.json mtime, song_vectors.npy mtime). Every cache derived from the
+    corpus takes this as its key, so editing songs.json / re-running
+    embeddings.py reloads all of them together on the next rerun.
     """
-    if x is None:
-        return []
-    if isinstance(x, list):
-        return [str(v).strip() for v in x if str(v).strip()]
-    if isinstance(x, str):
-        s = x.strip()
-        return [s] if s else []
-    return [str(x).strip()] if str(x).strip() else []
+    return (_mtime(SONGS_PATH), _mtime(VECTORS_PATH))
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_songs(version: Tuple[float, float]) -> Tuple[List[Dict[str, Any]], str]:
+    """songs.json parsed, plus the SHA-1 of the same bytes (see _get_facet_options)."""
+    raw = _read_songs_bytes()
+    return load_songs(raw), songs_sha1(raw)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_corpus(version: Tuple[float, float]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Load songs.json + song_vectors.npy once per corpus version instead of on
+    every search. cache_resource (not cache_data) so the memmap handle is kept
+    as-is rather than pickled into a full in-memory copy; treat the result as
+    read-only.
+    """
+    songs, _ = _get_songs(version)
+    return songs, load_vectors()
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_result_rows(version: Tuple[float, float]) -> List[Dict[str, Any]]:
+    """
+    Songs projected onto RETURN_FIELDS once, so each hit copies only what the
+    UI uses, plus the pre-joined `_tag_strings` (see TAG_FIELDS).
+    """
+    songs, _ = _get_corpus(version)
+    return [
+        {
+            **{k: s[k] for k in RETURN_FIELDS if k in s},
+            "_tag_strings": tuple((f, join_tags(s.get(f, []))) for f in TAG_FIELDS),
+        }
+        for s in songs
+    ]
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_facet_index(version: Tuple[float, float]) -> FacetIndex:
+    """Per-(facet, value) boolean masks over the cached corpus."""
+    songs, _ = _get_corpus(version)
+    return build_facet_index(songs)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_facet_options(version: Tuple[float, float]) -> Dict[str, List[str]]:
+    # Precomputed by embeddings.py; only rescan the songs if that file is
+    # missing or was built from different songs.json bytes. (Compared by hash,
+    # not mtime: a fresh clone gives both files arbitrary checkout mtimes.)
+    songs, sha1 = _get_songs(version)
+    if FACET_OPTIONS_PATH.exists():
+        saved = json.loads(FACET_OPTIONS_PATH.read_text(encoding="utf-8"))
+        if isinstance(saved, dict) and saved.get("songs_sha1") == sha1:
+            return saved["options"]
+    return collect_facet_options(songs)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_hnsw_index(version: Tuple[float, float]):
+    """HNSW index over song_vectors, or None if hnswlib / the index file is missing or stale."""
+    if hnswlib is None or not HNSW_INDEX_PATH.exists():
+        return None
+    songs, song_vectors = _get_corpus(version)
+    index = hnswlib.Index(space="cosine", dim=song_vectors.shape[1])
+    index.load_index(str(HNSW_INDEX_PATH), max_elements=len(songs))
+    if index.get_current_count() != len(songs):
+        return None
+    index.set_ef(HNSW_EF_SEARCH)
+    return index
+
+
+def _hnsw_top_k(
+    index, query_vec: np.ndarray, top_k: int, keep_mask: Optional[np.ndarray]
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Approximate (song indices, scores) for the top_k songs, restricted to
+    keep_mask via hnswlib's filter callback. None if the graph search can't
+    find top_k allowed songs (caller falls back to brute force).
+    """
+    allowed = None if keep_mask is None else (lambda label: bool(keep_mask[label]))
+    try:
+        labels, dists = index.knn_query(query_vec, k=top_k, filter=allowed)
+    except RuntimeError:
+        return None
+    # cosine space returns distance = 1 - cosine similarity
+    return labels[0].astype(np.int64), 1.0 - dists[0]
 
 
-def _matches_multi_select(song_val: Any, selected: List[str]) -> bool:
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_int8_corpus(version: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+    return load_int8_vectors()
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _embed_query(
+    query_str: str, model_name: str = MODEL_NAME, backend: str = EMBED_BACKEND
+) -> np.ndarray:
     """
-    OR logic within a facet:
-    - If selected is empty -> True (no constraint)
-    - If song_val is list or str -> must share at least one selected tag
+    Embed a normalized query string (cached, so reruns with the same query
+    skip the transformer forward pass). The model name and backend are part
+    of the cache key so swapping either can't serve stale vectors.
     """
-    if not selected:
-        return True
-    song_tags = set(_as_list(song_val))
-    selected_set = set([s.strip() for s in selected if s.strip()])
-    return len(song_tags.intersection(selected_set)) > 0
+    return _as_query_vec(_get_model(model_name, backend).encode([query_str], normalize_embeddings=True)[0])
+
+
+def _ensure_top_k(top_k: int, n_items: int) -> int:
+    if top_k <= 0:
+        return 5
+    return min(top_k, n_items)
 
 
-def _matches_single(song_val: Any, selected: Optional[str]) -> bool:
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
     """
-    Single-select facet (energy):
-    - If selected is None -> True
-    - If song_val is list or str -> must contain selected
+    Indices of the top_k highest scores, best first.
+    Uses argpartition (O(n + k log k)) and only falls back to a full sort
+    when every item is requested anyway.
     """
-    if selected is None or selected == "":
-        return True
-    song_tags = set(_as_list(song_val))
-    return selected in song_tags
+    if top_k >= len(scores):
+        return np.argsort(scores)[::-1]
+    part = np.argpartition(scores, -top_k)[-top_k:]
+    return part[np.argsort(scores[part])[::-1]]
 
 
 def filter_song_indices(
     songs: List[Dict[str, Any]],
     filters: Optional[Dict[str, Any]] = None,
-) -> List[int]:
+    index: Optional[FacetIndex] = None,
+) -> np.ndarray:
     """
     AND logic across facets:
     mood/activity/genre: OR within each facet, AND across facets
     energy: single select
+    Uses the precomputed facet masks (pass `index` to reuse a cached one).
     """
     if not filters:
-        return list(range(len(songs)))
+        return np.arange(len(songs))
 
-    selected_mood = filters.get("mood", []) or []
-    selected_activity = filters.get("activity", []) or []
-    selected_genre = filters.get("genre", []) or []
-    selected_energy = filters.get("energy", None)
+    index = index if index is not None else build_facet_index(songs)
+    return np.flatnonzero(_filters_mask(index, len(songs), filters))
 
-    keep: List[int] = []
-    for i, s in enumerate(songs):
-        if not _matches_multi_select(s.get("mood"), selected_mood):
-            continue
-        if not _matches_multi_select(s.get("activity"), selected_activity):
-            continue
-        if not _matches_multi_select(s.get("genre"), selected_genre):
-            continue
-        if not _matches_single(s.get("energy"), selected_energy):
-            continue
-        keep.append(i)
 
-    return keep
+def _filters_mask(index: FacetIndex, n: int, filters: Dict[str, Any]) -> np.ndarray:
+    return facet_mask(
+        index,
+        n,
+        mood=filters.get("mood"),
+        activity=filters.get("activity"),
+        energy=filters.get("energy"),
+        genre=filters.get("genre"),
+    )
+
+
+def count_in_scope(filters: Optional[Dict[str, Any]] = None) -> int:
+    """Number of songs passing the facet filters (popcount of the mask, no search)."""
+    version = corpus_version()
+    songs, _ = _get_corpus(version)
+    if not filters:
+        return len(songs)
+    return int(_filters_mask(_get_facet_index(version), len(songs), filters).sum())
 
 
 def get_facet_options(songs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, List[str]]:
     """
     Build facet option lists directly from songs.json.
+    Same as facets.collect_facet_options (kept here for existing callers);
+    without `songs` it uses data/facet_options.json or the cached corpus,
+    memoized per corpus version.
     """
-    songs = songs or load_songs()
-
-    moods = sorted({t for s in songs for t in _as_list(s.get("mood"))})
-    activities = sorted({t for s in songs for t in _as_list(s.get("activity"))})
-    genres = sorted({t for s in songs for t in _as_list(s.get("genre"))})
-    energies = sorted({t for s in songs for t in _as_list(s.get("energy"))})
-
-    return {
-        "mood": moods,
-        "activity": activities,
-        "genre": genres,
-        "energy": energies,  # e.g. ["high","low","medium"] depending on your data
-    }
+    if not songs:
+        return _get_facet_options(corpus_version())
+    return collect_facet_options(songs)
 
 
 def semantic_search(
@@ -145,11 +375,14 @@ def semantic_search(
     Hybrid behavior:
     - If query is provided -> rank by cosine similarity (within filtered subset)
     - If query is None/empty -> return filtered subset (no scores), truncated to top_k
+    Each hit holds the RETURN_FIELDS the song has plus "_tag_strings" (see
+    TAG_FIELDS), and "score" in query mode.
     """
-    songs = load_songs()
+    version = corpus_version()
+    songs, song_vectors = _get_corpus(version)
 
     # Filter first (Step 7 requirement)
-    keep_idx = filter_song_indices(songs, filters=filters)
+    keep_idx = filter_song_indices(songs, filters=filters, index=_get_facet_index(version))
     if len(keep_idx) == 0:
         return []
 
@@ -157,10 +390,10 @@ def semantic_search(
     query_str = (query or "").strip()
     if not query_str:
         top_k = _ensure_top_k(top_k, len(keep_idx))
-        return [songs[i] for i in keep_idx[:top_k]]
+        rows = _get_result_rows(version)
+        return [dict(rows[i]) for i in keep_idx[:top_k].tolist()]
 
     # Semantic mode needs vectors
-    song_vectors = load_vectors()
     if len(songs) != song_vectors.shape[0]:
         raise ValueError(
             f"Mismatch: songs.json has {len(songs)} songs but song_vectors has "
@@ -169,32 +402,121 @@ def semantic_search(
 
     top_k = _ensure_top_k(top_k, len(keep_idx))
 
-    # Load model once (caller can pass a cached model)
-    model = model or SentenceTransformer(MODEL_NAME)
-
-    # Embed query (normalized so dot product becomes cosine similarity)
-    query_vec = model.encode([query_str], normalize_embeddings=True)[0]  # (384,)
-
-    # Compute similarity ONLY for the filtered subset
-    subset_vecs = song_vectors[keep_idx]               # (m, 384)
-    subset_scores = subset_vecs @ query_vec            # (m,)
-
-    # Get top_k within subset
-    subset_top = np.argsort(subset_scores)[::-1][:top_k]
-
+    # Embed query (normalized so dot product becomes cosine similarity).
+    # MiniLM is uncased, so lowercasing only improves cache hits.
+    if model is None:
+        query_vec = _embed_query(query_str.lower(), MODEL_NAME, EMBED_BACKEND)  # (384,)
+    else:
+        query_vec = _as_query_vec(model.encode([query_str], normalize_embeddings=True)[0])
+
+    everything = len(keep_idx) == len(songs)
+    # Usually cheaper to score every song in one pass and pick out the
+    # filtered ones than to gather a (m, 384) copy first; only gather when
+    # the filters leave a small fraction of the library, or no more songs
+    # than top_k (every one of them is returned anyway).
+    gather = len(keep_idx) <= top_k or len(keep_idx) < GATHER_BELOW_FRACTION * len(songs)
+
+    # Gathered candidates are few enough that exact scoring beats HNSW.
+    hits = None
+    if len(songs) >= HNSW_MIN_SONGS and not gather:
+        hnsw_index = _get_hnsw_index(version)
+        if hnsw_index is not None:
+            keep_mask = None
+            if not everything:
+                keep_mask = np.zeros(len(songs), dtype=bool)
+                keep_mask[keep_idx] = True
+            hits = _hnsw_top_k(hnsw_index, query_vec, top_k, keep_mask)
+
+    if hits is None:
+        if USE_INT8_VECTORS:
+            q_vecs, scales = _get_int8_corpus(version)
+            if gather:
+                q_vecs, scales = q_vecs[keep_idx], scales[keep_idx]
+            scores = _int8_scores(q_vecs, scales, query_vec)
+        else:
+            scores = _sharded_dot_scores(song_vectors[keep_idx] if gather else song_vectors, query_vec)
+        subset_scores = scores if gather or everything else scores[keep_idx]  # (m,)
+
+        # Get top_k within subset, mapped back to song indices
+        subset_top = _top_k_indices(subset_scores, top_k)
+        hits = (keep_idx[subset_top], subset_scores[subset_top])
+
+    # Scores stay float32 end to end; .tolist() converts to Python ints/floats in bulk
+    top_idx, top_scores = hits
+    rows = _get_result_rows(version)
     results: List[Dict[str, Any]] = []
-    for j in subset_top:
-        song_i = keep_idx[int(j)]
+    for song_i, score in zip(top_idx.tolist(), top_scores.tolist()):
         results.append(
             {
-                "score": float(subset_scores[int(j)]),
-                **songs[song_i],
+                "score": score,
+                **rows[song_i],
             }
         )
 
     return results
 
 
+@st.cache_resource(show_spinner=False)
+def warmup() -> None:
+    """
+    Pay the one-time costs up front (corpus + facet index, model load, first
+    forward pass, first matmul) so the first real query only does the search.
+    Cached, so it runs once per process. A failure is only logged: cache_resource
+    doesn't cache exceptions, so raising would break every rerun (browse mode
+    included); the real error still surfaces on the first query.
+    """
+    try:
+        version = corpus_version()
+        _, song_vectors = _get_corpus(version)
+        _get_facet_index(version)
+        model = _get_model(MODEL_NAME, EMBED_BACKEND)
+        query_vec = _as_query_vec(model.encode(["warmup"], normalize_embeddings=True)[0])
+        _dot_scores(song_vectors, query_vec)
+    except Exception:
+        logger.warning("Search warmup failed", exc_info=True)
+
+
+def _facet_key(selected: Optional[List[str]]) -> Tuple[str, ...]:
+    return tuple(sorted({v.strip() for v in (selected or []) if v.strip()}))
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _cached_search(
+    query_str: str,
+    top_k: int,
+    mood: Tuple[str, ...],
+    activity: Tuple[str, ...],
+    genre: Tuple[str, ...],
+    energy: Optional[str],
+    version: Tuple[float, float],
+) -> List[Dict[str, Any]]:
+    # `version` only keys the cache: results are dropped when the corpus changes
+    filters = {"mood": list(mood), "activity": list(activity), "genre": list(genre), "energy": energy}
+    return semantic_search(query_str or None, top_k=top_k, filters=filters)
+
+
+def cached_semantic_search(
+    query: Optional[str],
+    top_k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    semantic_search memoized on (query, top_k, filters), so Streamlit reruns
+    that don't change the search (slider, expanders, ...) are a cache lookup.
+    Filters are turned into sorted tuples to make them hashable/order-free.
+    """
+    filters = filters or {}
+    return _cached_search(
+        (query or "").strip().lower(),  # same normalization as the query embedding
+        top_k,
+        _facet_key(filters.get("mood")),
+        _facet_key(filters.get("activity")),
+        _facet_key(filters.get("genre")),
+        (filters.get("energy") or "").strip() or None,
+        corpus_version(),
+    )
+
+
 if __name__ == "__main__":
     test_query = "soft dreamy songs for late night walking"
     hits = semantic_search(test_query, top_k=5, filters=None)